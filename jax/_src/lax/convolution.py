@@ -21,15 +21,17 @@ import numpy as np
 from jax import core
 from jax._src import dtypes
 from jax._src.lax import lax
+from jax._src.lax import slicing
 from jax.interpreters import ad
 from jax.interpreters import batching
 from jax.interpreters import masking
 from jax.interpreters import mlir
-from jax._src.util import safe_zip
+from jax._src.util import cache, safe_zip
 from jax._src.lib.mlir.dialects import mhlo
 from jax._src.lib import xla_client
 
 _max = builtins.max
+_astuple = lambda x: x if type(x) is tuple else tuple(x)
 
 Array = Any
 DType = Any
@@ -136,23 +138,32 @@ def conv_general_dilated(
     rhs_dilation = (1,) * (rhs.ndim - 2)
   if isinstance(padding, str):
     lhs_perm, rhs_perm, _ = dnums
-    rhs_shape = np.take(rhs.shape, rhs_perm)[2:]  # type: ignore[index]
+    rhs_shape = _take_tuple(rhs.shape, rhs_perm)[2:]
     effective_rhs_shape = [(k-1) * r + 1 for k, r in zip(rhs_shape, rhs_dilation)]
     padding = lax.padtype_to_pads(
-        np.take(lhs.shape, lhs_perm)[2:], effective_rhs_shape,  # type: ignore[index]
+        _take_tuple(lhs.shape, lhs_perm)[2:], effective_rhs_shape,
         window_strides, padding)
   preferred_element_type = (
       None if preferred_element_type is None else
       dtypes.canonicalize_dtype(np.dtype(preferred_element_type)))
-  return conv_general_dilated_p.bind(
-      lhs, rhs, window_strides=tuple(window_strides), padding=tuple(padding),
-      lhs_dilation=tuple(lhs_dilation), rhs_dilation=tuple(rhs_dilation),
+  params = dict(
+      window_strides=_astuple(window_strides), padding=_astuple(padding),
+      lhs_dilation=_astuple(lhs_dilation), rhs_dilation=_astuple(rhs_dilation),
       dimension_numbers=dnums,
       feature_group_count=feature_group_count,
       batch_group_count=batch_group_count,
       lhs_shape=lhs.shape, rhs_shape=rhs.shape,
       precision=lax.canonicalize_precision(precision),
       preferred_element_type=preferred_element_type)
+  if core.is_empty_shape(lhs.shape) or core.is_empty_shape(rhs.shape):
+    # Every output element is a sum over no terms, so rather than compiling and
+    # running a degenerate convolution we return zeros. We still go through
+    # the abstract evaluation rule so that the arguments are validated.
+    out_aval, _ = conv_general_dilated_p.abstract_eval(
+        core.raise_to_shaped(core.get_aval(lhs)),
+        core.raise_to_shaped(core.get_aval(rhs)), **params)
+    return lax.zeros_like_shaped_array(out_aval)
+  return conv_general_dilated_p.bind(lhs, rhs, **params)
 
 
 ### convenience wrappers around traceables
@@ -240,7 +251,7 @@ def _conv_transpose_padding(k, s, padding):
     if s > k - 1:
       pad_a = k - 1
     else:
-      pad_a = int(np.ceil(pad_len / 2))
+      pad_a = (pad_len + 1) // 2
   elif padding == 'VALID':
     pad_len = k + s - 2 + _max(k - s, 0)
     pad_a = k - 1
@@ -250,12 +261,14 @@ def _conv_transpose_padding(k, s, padding):
   return pad_a, pad_b
 
 
-def _flip_axes(x, axes):
-  """Flip ndarray 'x' along each axis specified in axes tuple."""
-  for axis in axes:
-    x = np.flip(x, axis)
-  return x
-
+# Default (tensorflow convention) dimension numbers for conv_transpose, keyed
+# by operand rank.
+_conv_transpose_default_dimension_numbers = {
+  2: ('NC', 'IO', 'NC'),
+  3: ('NHC', 'HIO', 'NHC'),
+  4: ('NHWC', 'HWIO', 'NHWC'),
+  5: ('NHWDC', 'HWDIO', 'NHWDC'),
+}
 
 def conv_transpose(lhs: Array, rhs: Array, strides: Sequence[int],
                    padding: Union[str, Sequence[Tuple[int, int]]],
@@ -303,33 +316,31 @@ def conv_transpose(lhs: Array, rhs: Array, strides: Sequence[int],
   one = (1,) * (ndims - 2)
   # Set dimensional layout defaults if not specified.
   if dimension_numbers is None:
-    if ndims == 2:
-      dimension_numbers = ('NC', 'IO', 'NC')
-    elif ndims == 3:
-      dimension_numbers = ('NHC', 'HIO', 'NHC')
-    elif ndims == 4:
-      dimension_numbers = ('NHWC', 'HWIO', 'NHWC')
-    elif ndims == 5:
-      dimension_numbers = ('NHWDC', 'HWDIO', 'NHWDC')
-    else:
+    dimension_numbers = _conv_transpose_default_dimension_numbers.get(ndims)
+    if dimension_numbers is None:
       raise ValueError('No 4+ dimensional dimension_number defaults.')
   dn = conv_dimension_numbers(lhs.shape, rhs.shape, dimension_numbers)
-  k_shape = np.take(rhs.shape, dn.rhs_spec)
-  k_sdims = k_shape[2:]  # type: ignore[index]
+  k_shape = _take_tuple(rhs.shape, dn.rhs_spec)
+  k_sdims = k_shape[2:]
   # Calculate correct output shape given padding and strides.
   pads: Union[str, Sequence[Tuple[int, int]]]
   if isinstance(padding, str) and padding in {'SAME', 'VALID'}:
     if rhs_dilation is None:
       rhs_dilation = (1,) * (rhs.ndim - 2)
-    effective_k_size = map(lambda k, r: (k-1) * r + 1, k_sdims, rhs_dilation)
-    pads = [_conv_transpose_padding(k, s, padding)
-            for k,s in zip(effective_k_size, strides)]
+    pads = [_conv_transpose_padding((k-1) * r + 1, s, padding)
+            for k, r, s in zip(k_sdims, rhs_dilation, strides)]
   else:
     pads = padding
   if transpose_kernel:
     # flip spatial dims and swap input / output channel axes
-    rhs = _flip_axes(rhs, np.array(dn.rhs_spec)[2:])
-    rhs = np.swapaxes(rhs, dn.rhs_spec[0], dn.rhs_spec[1])
+    perm = list(range(rhs.ndim))
+    perm[dn.rhs_spec[0]], perm[dn.rhs_spec[1]] = dn.rhs_spec[1], dn.rhs_spec[0]
+    if isinstance(rhs, np.ndarray):
+      # Both are views, so the kernel is copied only once, when it is
+      # transferred to the device.
+      rhs = np.transpose(np.flip(rhs, axis=dn.rhs_spec[2:]), perm)
+    else:
+      rhs = lax.transpose(lax.rev(rhs, dn.rhs_spec[2:]), perm)
   return conv_general_dilated(lhs, rhs, one, pads, strides, rhs_dilation, dn,
                               precision=precision,
                               preferred_element_type=preferred_element_type)
@@ -387,18 +398,36 @@ def _conv_general_dilated_shape_rule(
            "1, got batch_group_count={} and feature_group_count={}")
     raise ValueError(msg.format(batch_group_count, feature_group_count))
 
-  if len(_conv_sdims(dimension_numbers.rhs_spec)) != len(window_strides):
+  if len(dimension_numbers.rhs_spec) - 2 != len(window_strides):
     msg = ("conv_general_dilated window and window_strides must have "
            "the same number of dimensions, but got {} and {}")
     raise ValueError(
-        msg.format(len(_conv_sdims(dimension_numbers.rhs_spec)), len(window_strides)))
-
+        msg.format(len(dimension_numbers.rhs_spec) - 2, len(window_strides)))
+
+  # NOTE: The output shape computation is memoized with util.cache, like
+  # lax.broadcast_shapes, which also turns caching off while checking for
+  # tracer leaks. Tracers in shapes are unhashable, and comparing a symbolic
+  # dimension in a cache key may be inconclusive; both take the uncached path.
+  args = (lhs.shape, rhs.shape, window_strides, padding, lhs_dilation,
+          rhs_dilation, dimension_numbers, batch_group_count)
+  try:
+    return _conv_general_dilated_out_shape_cached(*args)
+  except (TypeError, core.InconclusiveDimensionOperation):
+    return _conv_general_dilated_out_shape(*args)
+
+@cache()
+def _conv_general_dilated_out_shape_cached(*args) -> Tuple[int, ...]:
+  return _conv_general_dilated_out_shape(*args)
+
+def _conv_general_dilated_out_shape(
+    lhs_shape, rhs_shape, window_strides, padding, lhs_dilation, rhs_dilation,
+    dimension_numbers, batch_group_count) -> Tuple[int, ...]:
   lhs_perm, rhs_perm, out_perm = dimension_numbers
-  lhs_trans = lax._dilate_shape(np.take(lhs.shape, lhs_perm), lhs_dilation)
-  rhs_trans = lax._dilate_shape(np.take(rhs.shape, rhs_perm), rhs_dilation)
+  lhs_trans = _maybe_dilate_shape(_take_tuple(lhs_shape, lhs_perm), lhs_dilation)
+  rhs_trans = _maybe_dilate_shape(_take_tuple(rhs_shape, rhs_perm), rhs_dilation)
   out_trans = conv_shape_tuple(lhs_trans, rhs_trans, window_strides, padding,
                                batch_group_count)
-  return tuple(np.take(out_trans, np.argsort(out_perm)))  # type: ignore[arg-type]
+  return _take_tuple(out_trans, _invert_perm(out_perm))
 
 
 def _conv_general_dilated_dtype_rule(
@@ -411,9 +440,6 @@ def _conv_general_dilated_dtype_rule(
   lax._validate_preferred_element_type(input_dtype, preferred_element_type)
   return preferred_element_type
 
-_conv_spec_transpose = lambda spec: (spec[1], spec[0]) + spec[2:]
-_conv_sdims = lambda spec: spec[2:]
-
 # Understanding the convolution transpose rules:
 # Ignoring the spatial dimensions, let m = batch, j = input feature,
 # k = output feature.
@@ -447,9 +473,9 @@ def _conv_general_dilated_transpose_lhs(
     lhs_shape, rhs_shape, precision, preferred_element_type):
   assert type(dimension_numbers) is ConvDimensionNumbers
   assert batch_group_count == 1 or feature_group_count == 1
-  lhs_sdims, rhs_sdims, out_sdims = map(_conv_sdims, dimension_numbers)
   lhs_spec, rhs_spec, out_spec = dimension_numbers
-  t_rhs_spec = _conv_spec_transpose(rhs_spec)
+  lhs_sdims, rhs_sdims, out_sdims = lhs_spec[2:], rhs_spec[2:], out_spec[2:]
+  t_rhs_spec = (rhs_spec[1], rhs_spec[0]) + rhs_sdims
   if feature_group_count > 1:
     # in addition to switching the dims in the spec, need to move the feature
     # group axis into the transposed rhs's output feature dim
@@ -461,8 +487,8 @@ def _conv_general_dilated_transpose_lhs(
     feature_group_count = batch_group_count
   trans_dimension_numbers = ConvDimensionNumbers(out_spec, t_rhs_spec, lhs_spec)
   padding = _conv_general_vjp_lhs_padding(
-      np.take(lhs_shape, lhs_sdims), np.take(rhs_shape, rhs_sdims),
-      window_strides, np.take(g.shape, out_sdims), padding, lhs_dilation,
+      _take_tuple(lhs_shape, lhs_sdims), _take_tuple(rhs_shape, rhs_sdims),
+      window_strides, _take_tuple(g.shape, out_sdims), padding, lhs_dilation,
       rhs_dilation)
   revd_weights = lax.rev(rhs, rhs_sdims)
   out = conv_general_dilated(
@@ -492,8 +518,11 @@ def _conv_general_dilated_transpose_rhs(
     # are treated the same operationally.
     # TODO(mattjj): adjust defbilinear so that the rhs aval is available here
     return None
-  lhs_sdims, rhs_sdims, out_sdims = map(_conv_sdims, dimension_numbers)
-  lhs_trans, rhs_trans, out_trans = map(_conv_spec_transpose, dimension_numbers)
+  lhs_spec, rhs_spec, out_spec = dimension_numbers
+  lhs_sdims, rhs_sdims, out_sdims = lhs_spec[2:], rhs_spec[2:], out_spec[2:]
+  lhs_trans = (lhs_spec[1], lhs_spec[0]) + lhs_sdims
+  rhs_trans = (rhs_spec[1], rhs_spec[0]) + rhs_sdims
+  out_trans = (out_spec[1], out_spec[0]) + out_sdims
   assert batch_group_count == 1 or feature_group_count == 1
   if batch_group_count > 1:
     feature_group_count = batch_group_count
@@ -503,8 +532,8 @@ def _conv_general_dilated_transpose_rhs(
     feature_group_count = 1
   trans_dimension_numbers = ConvDimensionNumbers(lhs_trans, out_trans, rhs_trans)
   padding = _conv_general_vjp_rhs_padding(
-      np.take(lhs_shape, lhs_sdims), np.take(rhs_shape, rhs_sdims),
-      window_strides, np.take(g.shape, out_sdims), padding, lhs_dilation,
+      _take_tuple(lhs_shape, lhs_sdims), _take_tuple(rhs_shape, rhs_sdims),
+      window_strides, _take_tuple(g.shape, out_sdims), padding, lhs_dilation,
       rhs_dilation)
   return conv_general_dilated(
       lhs, g, window_strides=rhs_dilation, padding=padding,
@@ -551,12 +580,8 @@ def _conv_general_dilated_batch_rule(
       out = _reshape_axis_out_of(out_spec[0], lhs.shape[lhs_bdim], out)
       return out, out_spec[0]
     else:
-      new_lhs = _reshape_axis_out_of(lhs_spec[0] + int(lhs_bdim <= lhs_spec[0]),
-                                     batch_group_count, lhs)
-      new_lhs = _reshape_axis_into(lhs_bdim + int(lhs_spec[0] < lhs_bdim),
-                                   lhs_spec[0] + 1,
-                                   new_lhs)
-      new_lhs = _reshape_axis_into(lhs_spec[0], lhs_spec[0], new_lhs)
+      new_lhs = _reshape_axis_into_group(lhs_bdim, lhs_spec[0],
+                                         batch_group_count, lhs)
       out = conv_general_dilated(new_lhs, rhs, window_strides, padding,
                                  lhs_dilation, rhs_dilation, dimension_numbers,
                                  feature_group_count, batch_group_count,
@@ -575,28 +600,42 @@ def _conv_general_dilated_batch_rule(
                                  preferred_element_type=preferred_element_type)
       out = _reshape_axis_out_of(out_spec[1], rhs.shape[rhs_bdim], out)
       return out, out_spec[1]
+    elif rhs_bdim == rhs_spec[0]:
+      # The batch dim already sits just outside the rhs output feature dim, so
+      # folding it in makes the batch the outermost groups. Broadcasting lhs
+      # along its grouped dim to match then needs no transposes at all, at the
+      # cost of materializing the broadcast lhs.
+      size = rhs.shape[rhs_bdim]
+      if feature_group_count > 1:
+        new_lhs = _broadcast_axis_into(lhs_spec[1], size, lhs)
+        feature_group_count *= size
+      else:
+        new_lhs = _broadcast_axis_into(lhs_spec[0], size, lhs)
+        batch_group_count *= size
+      new_rhs = _reshape_axis_into(rhs_bdim, rhs_spec[0], rhs)
+      out = conv_general_dilated(new_lhs, new_rhs, window_strides, padding,
+                                 lhs_dilation, rhs_dilation, dimension_numbers,
+                                 feature_group_count, batch_group_count,
+                                 precision=precision,
+                                 preferred_element_type=preferred_element_type)
+      out = _reshape_axis_out_of(out_spec[1], size, out)
+      return out, out_spec[1]
     else:
       # groups need to be outermost, so we need to factor them out of the
       # rhs output feature dim, then factor the batch dim into the remaining rhs
       # output feature dim, then put groups back in. We do something
-      # similar on the output. An alternative which would require more FLOPs but
-      # fewer reshapes would be to broadcast lhs.
+      # similar on the output. The branch above instead broadcasts lhs, which
+      # avoids the transposes but costs more memory.
       group_count = (feature_group_count if feature_group_count > 1
                      else batch_group_count)
-      new_rhs = _reshape_axis_out_of(rhs_spec[0] + int(rhs_bdim <= rhs_spec[0]),
-                                     group_count, rhs)
-      new_rhs = _reshape_axis_into(rhs_bdim + int(rhs_spec[0] < rhs_bdim),
-                                   rhs_spec[0] + 1,
-                                   new_rhs)
-      new_rhs = _reshape_axis_into(rhs_spec[0], rhs_spec[0], new_rhs)
+      new_rhs = _reshape_axis_into_group(rhs_bdim, rhs_spec[0], group_count, rhs)
       out = conv_general_dilated(lhs, new_rhs, window_strides, padding,
                                  lhs_dilation, rhs_dilation, dimension_numbers,
                                  feature_group_count, batch_group_count,
                                  precision=precision,
                                  preferred_element_type=preferred_element_type)
-      out = _reshape_axis_out_of(out_spec[1], group_count, out)
-      out = _reshape_axis_out_of(out_spec[1] + 1, rhs.shape[rhs_bdim], out)
-      out = _reshape_axis_into(out_spec[1], out_spec[1] + 1, out)
+      out = _reshape_axis_out_of_group(out_spec[1], group_count,
+                                       rhs.shape[rhs_bdim], out)
       return out, out_spec[1]
 
 def _conv_general_dilated_masking_rule(
@@ -654,6 +693,37 @@ def _complex_mul(mul, x, y):
   k3 = mul(x_im, lax.add(y_re, y_im))
   return lax.complex(lax.sub(k1, k3), lax.add(k1, k2))
 
+def _complex_mul_naive(mul, x, y):
+  # The naive method of four multiplications and two additions. Unlike the
+  # Gauss trick above, the real and imaginary parts of the result each satisfy
+  # the relative error bound independently of each other.
+  x_re, x_im = lax.real(x), lax.imag(x)
+  y_re, y_im = lax.real(y), lax.imag(y)
+  return lax.complex(lax.sub(mul(x_re, y_re), mul(x_im, y_im)),
+                     lax.add(mul(x_re, y_im), mul(x_im, y_re)))
+
+def _complex_conv_block(x, y, *, dimension_numbers, **params):
+  # Computes the same products as _complex_mul_naive, but as a single real
+  # convolution of [x_re, x_im] with the block kernel
+  #   [[y_re, y_im],
+  #    [-y_im, y_re]]
+  # (input features along rows, output features along columns), so that the
+  # contraction over the input features also performs the two additions.
+  # Only valid without feature or batch grouping.
+  lhs_spec, rhs_spec, out_spec = dimension_numbers
+  x_re, x_im = lax.real(x), lax.imag(x)
+  y_re, y_im = lax.real(y), lax.imag(y)
+  lhs = lax.concatenate([x_re, x_im], lhs_spec[1])
+  rhs = lax.concatenate(
+      [lax.concatenate([y_re, lax.neg(y_im)], rhs_spec[1]),
+       lax.concatenate([y_im, y_re], rhs_spec[1])], rhs_spec[0])
+  out = conv_general_dilated(lhs, rhs, dimension_numbers=dimension_numbers,
+                             **params)
+  size = y.shape[rhs_spec[0]]
+  re = slicing.slice_in_dim(out, 0, size, axis=out_spec[1])
+  im = slicing.slice_in_dim(out, size, 2 * size, axis=out_spec[1])
+  return lax.complex(re, im)
+
 
 _real_dtype = lambda dtype: np.finfo(dtype).dtype
 
@@ -671,17 +741,23 @@ def _conv_general_dilated_lower(
       # Convert complex dtype to types used for real and imaginary parts
       assert np.issubdtype(preferred_element_type, np.complexfloating)
       preferred_element_type = _real_dtype(preferred_element_type)
-    complex_conv = mlir.lower_fun(
-      partial(
-        _complex_mul,
-        partial(conv_general_dilated, window_strides=window_strides,
-                padding=padding, lhs_dilation=lhs_dilation,
-                rhs_dilation=rhs_dilation, dimension_numbers=dimension_numbers,
-                feature_group_count=feature_group_count,
-                batch_group_count=batch_group_count, precision=precision,
-                preferred_element_type=preferred_element_type)),
-      multiple_results=False)
-    return complex_conv(ctx, lhs, rhs)
+    params = dict(window_strides=window_strides, padding=padding,
+                  lhs_dilation=lhs_dilation, rhs_dilation=rhs_dilation,
+                  dimension_numbers=dimension_numbers,
+                  feature_group_count=feature_group_count,
+                  batch_group_count=batch_group_count, precision=precision,
+                  preferred_element_type=preferred_element_type)
+    if precision is not None and lax.Precision.HIGHEST in precision:
+      # The Gauss trick trades accuracy for a multiplication, which isn't what
+      # was asked for.
+      if feature_group_count == 1 and batch_group_count == 1:
+        complex_conv = partial(_complex_conv_block, **params)
+      else:
+        complex_conv = partial(_complex_mul_naive,
+                               partial(conv_general_dilated, **params))
+    else:
+      complex_conv = partial(_complex_mul, partial(conv_general_dilated, **params))
+    return mlir.lower_fun(complex_conv, multiple_results=False)(ctx, lhs, rhs)
 
   lhs_spec, rhs_spec, out_spec = dimension_numbers
   dnums = mhlo.ConvDimensionNumbers.get(
@@ -710,29 +786,91 @@ mlir.register_lowering(conv_general_dilated_p, _conv_general_dilated_lower)
 # TODO(b/161124619, b/161126248): XLA does not support complex convolution on
 # GPU, and on CPU it uses a slow loop-based implementation;
 # on these backends, lower complex convolutions away.
-mlir.register_lowering(
-    conv_general_dilated_p,
-    partial(_conv_general_dilated_lower, expand_complex_convolutions=True),
-    platform='cpu')
-mlir.register_lowering(
-    conv_general_dilated_p,
-    partial(_conv_general_dilated_lower, expand_complex_convolutions=True),
-    platform='gpu')
+_conv_general_dilated_expand_complex_lower = partial(
+    _conv_general_dilated_lower, expand_complex_convolutions=True)
+for platform in ('cpu', 'gpu'):
+  mlir.register_lowering(conv_general_dilated_p,
+                         _conv_general_dilated_expand_complex_lower,
+                         platform=platform)
 
 
 def _reshape_axis_into(src, dst, x):
-  perm = [i for i in range(x.ndim) if i != src]
-  perm.insert(dst, src)
-  new_shape = list(np.delete(x.shape, src))
-  new_shape[dst] *= x.shape[src]
+  shape = x.shape
+  rest = shape[:src] + shape[src+1:]
+  new_shape = rest[:dst] + (shape[src] * rest[dst],) + rest[dst+1:]
+  if src == dst:
+    # `src` is already just outside `dst`, so no transpose is needed.
+    return lax.reshape(x, new_shape)
+  perm = tuple(i for i in range(x.ndim) if i != src)
+  perm = perm[:dst] + (src,) + perm[dst:]
   return lax.reshape(x, new_shape, perm)
 
 def _reshape_axis_out_of(src, size1, x):
-  shape = list(x.shape)
+  shape = x.shape
   size2, ragged = divmod(shape[src], size1)
   assert not ragged
-  shape[src:src+1] = [size1, size2]
-  return lax.reshape(x, shape)
+  return lax.reshape(x, shape[:src] + (size1, size2) + shape[src+1:])
+
+def _broadcast_axis_into(dst, size, x):
+  # Tiles axis `dst` of `x` `size` times, with the copies as the outer part of
+  # the resulting axis, i.e. _reshape_axis_into(dst, dst, ...) of a broadcast.
+  shape = list(x.shape)
+  shape.insert(dst, size)
+  dims = [i for i in range(x.ndim + 1) if i != dst]
+  new_shape = list(x.shape)
+  new_shape[dst] *= size
+  return lax.reshape(lax.broadcast_in_dim(x, shape, dims), new_shape)
+
+def _reshape_axis_into_group(src, dst, group_count, x):
+  # Like _reshape_axis_into, but with axis `dst` viewed as `group_count` outer
+  # groups the `src` axis is folded in just inside the groups. This is what
+  # _reshape_axis_out_of(dst, group_count) followed by _reshape_axis_into twice
+  # computes, but expressed as one split and one transpose+reshape.
+  dst_in_x = dst + int(src <= dst)
+  shape = list(x.shape)
+  size, ragged = divmod(shape[dst_in_x], group_count)
+  assert not ragged
+  shape[dst_in_x:dst_in_x+1] = [group_count, size]
+  src_split = src + int(src > dst)
+  perm = [i for i in range(len(shape)) if i != src_split]
+  perm.insert(dst + 1, src_split)
+  new_shape = list(x.shape[:src] + x.shape[src+1:])
+  new_shape[dst] *= x.shape[src]
+  return lax.reshape(lax.reshape(x, shape), new_shape, perm)
+
+def _reshape_axis_out_of_group(src, group_count, size1, x):
+  # Inverse of _reshape_axis_into_group: viewing axis `src` as
+  # (group_count, size1, size2), moves size1 out into a new axis at `src`
+  # followed by the remaining (group_count, size2) axis, using one split and
+  # one transpose+reshape.
+  shape = list(x.shape)
+  size2, ragged = divmod(shape[src], group_count * size1)
+  assert not ragged
+  shape[src:src+1] = [group_count, size1, size2]
+  perm = list(range(len(shape)))
+  perm[src], perm[src+1] = src + 1, src
+  new_shape = list(x.shape)
+  new_shape[src:src+1] = [size1, group_count * size2]
+  return lax.reshape(lax.reshape(x, shape), new_shape, perm)
+
+
+def _take_tuple(shape, perm):
+  """Like `np.take(shape, perm)` but returns a tuple of the original entries."""
+  return tuple(shape[i] for i in perm)
+
+def _invert_perm(perm):
+  """Like `np.argsort(perm)` for a permutation, but returns a tuple."""
+  inv = [0] * len(perm)
+  for i, p in enumerate(perm):
+    inv[p] = i
+  return tuple(inv)
+
+
+def _maybe_dilate_shape(shape, dilation):
+  # Dilations are almost always trivial, in which case the shape is unchanged.
+  if all(d == 1 for d in dilation):
+    return shape
+  return lax._dilate_shape(shape, dilation)
 
 
 def _check_conv_shapes(name, lhs_shape, rhs_shape, window_strides):
@@ -747,7 +885,7 @@ def _check_conv_shapes(name, lhs_shape, rhs_shape, window_strides):
     msg = "Arguments to {} must agree on input feature size, got {} and {}."
     raise TypeError(msg.format(name, lhs_shape[1], rhs_shape[1]))
   lax._check_shapelike(name, "window_strides", window_strides)
-  if not np.all(np.greater(window_strides, 0)):
+  if not all(s > 0 for s in window_strides):
     msg = "All elements of window_strides must be positive, got {}."
     raise TypeError(msg.format(window_strides))
   if len(window_strides) != len(lhs_shape) - 2:
@@ -764,10 +902,9 @@ def conv_shape_tuple(lhs_shape, rhs_shape, strides, pads, batch_group_count=1):
     msg = "Wrong number of explicit pads for convolution: expected {}, got {}."
     raise TypeError(msg.format(len(lhs_shape) - 2, len(pads)))
 
-  lhs_padded = np.add(lhs_shape[2:], np.sum(np.array(pads).reshape(-1, 2),
-                                              axis=1))
+  lhs_padded = tuple(l + lo + hi for l, (lo, hi) in zip(lhs_shape[2:], pads))
   out_space = core.stride_shape(lhs_padded, rhs_shape[2:], strides)
-  out_space = np.maximum(0, out_space)
+  out_space = tuple(_max(0, d) for d in out_space)
   if batch_group_count > 1:
     assert lhs_shape[0] % batch_group_count == 0
     out_shape_0 = lhs_shape[0] // batch_group_count
@@ -780,28 +917,28 @@ def conv_shape_tuple(lhs_shape, rhs_shape, strides, pads, batch_group_count=1):
 def conv_general_shape_tuple(lhs_shape, rhs_shape, window_strides, padding,
                              dimension_numbers):
   lhs_perm, rhs_perm, out_perm = conv_general_permutations(dimension_numbers)
-  lhs_trans = np.take(lhs_shape, lhs_perm)
-  rhs_trans = np.take(rhs_shape, rhs_perm)
+  lhs_trans = _take_tuple(lhs_shape, lhs_perm)
+  rhs_trans = _take_tuple(rhs_shape, rhs_perm)
   out_trans = conv_shape_tuple(lhs_trans, rhs_trans, window_strides, padding)
-  return tuple(np.take(out_trans, np.argsort(out_perm)))
+  return _take_tuple(out_trans, _invert_perm(out_perm))
 
 
 def conv_transpose_shape_tuple(lhs_shape, rhs_shape, window_strides, padding,
                                dimension_numbers):
   lhs_perm, rhs_perm, out_perm = conv_general_permutations(dimension_numbers)
-  lhs_trans = np.take(lhs_shape, lhs_perm)
-  rhs_trans = np.take(rhs_shape, rhs_perm)
+  lhs_trans = _take_tuple(lhs_shape, lhs_perm)
+  rhs_trans = _take_tuple(rhs_shape, rhs_perm)
   if isinstance(padding, str):
     padding = [_conv_transpose_padding(k, s, padding)
                for k,s in zip(rhs_trans[2:], window_strides)]
-  padding = list(map(np.sum, padding))
+  padding = [lo + hi for lo, hi in padding]
   unpad_out_space = [(i-1) * s - k + 2
                      for i, k, s in zip(lhs_trans[2:],
                                         rhs_trans[2:],
                                         window_strides)]
-  out_space = np.sum([unpad_out_space, padding], axis=0).tolist()
+  out_space = [u + p for u, p in zip(unpad_out_space, padding)]
   out_trans = tuple((lhs_trans[0], rhs_trans[0]) + tuple(out_space))
-  return tuple(np.take(out_trans, np.argsort(out_perm)))
+  return _take_tuple(out_trans, _invert_perm(out_perm))
 
 def conv_dimension_numbers(lhs_shape, rhs_shape, dimension_numbers
                            ) -> ConvDimensionNumbers:
@@ -820,6 +957,22 @@ def conv_dimension_numbers(lhs_shape, rhs_shape, dimension_numbers
   """
   if isinstance(dimension_numbers, ConvDimensionNumbers):
     return dimension_numbers
+  # NOTE: The result only depends on the ranks of lhs and rhs, so we cache on
+  # those. Unhashable (e.g. list) or invalid dimension_numbers take the
+  # uncached path, which raises errors that mention the full operand shapes.
+  try:
+    return _conv_dimension_numbers_cached(len(lhs_shape), len(rhs_shape),
+                                          dimension_numbers)
+  except TypeError:
+    return _conv_dimension_numbers_uncached(lhs_shape, rhs_shape,
+                                            dimension_numbers)
+
+@cache()
+def _conv_dimension_numbers_cached(lhs_ndim, rhs_ndim, dimension_numbers):
+  return _conv_dimension_numbers_uncached((None,) * lhs_ndim, (None,) * rhs_ndim,
+                                          dimension_numbers)
+
+def _conv_dimension_numbers_uncached(lhs_shape, rhs_shape, dimension_numbers):
   if len(lhs_shape) != len(rhs_shape):
     msg = "convolution requires lhs and rhs ndim to be equal, got {} and {}."
     raise TypeError(msg.format(len(lhs_shape), len(rhs_shape)))
@@ -849,6 +1002,18 @@ def conv_dimension_numbers(lhs_shape, rhs_shape, dimension_numbers
 
 def conv_general_permutations(dimension_numbers):
   """Utility for convolution dimension permutations relative to Conv HLO."""
+  # NOTE: Unhashable or invalid dimension_numbers take the uncached path, which
+  # raises the appropriate errors.
+  try:
+    return _conv_general_permutations_cached(tuple(dimension_numbers))
+  except TypeError:
+    return _conv_general_permutations(dimension_numbers)
+
+@cache()
+def _conv_general_permutations_cached(dimension_numbers):
+  return _conv_general_permutations(dimension_numbers)
+
+def _conv_general_permutations(dimension_numbers):
   lhs_spec, rhs_spec, out_spec = dimension_numbers
   lhs_char, rhs_char, out_char = charpairs = ("N", "C"), ("O", "I"), ("N", "C")
   for i, (a, b) in enumerate(charpairs):
@@ -866,10 +1031,12 @@ def conv_general_permutations(dimension_numbers):
            "set of spatial characters, got {}.")
     raise TypeError(msg.format(dimension_numbers))
 
+  rhs_pos = {c: i for i, c in enumerate(rhs_spec)}
+
   def getperm(spec, charpair):
     spatial = (i for i, c in enumerate(spec) if c not in charpair)
     if spec is not rhs_spec:
-      spatial = sorted(spatial, key=lambda i: rhs_spec.index(spec[i]))
+      spatial = sorted(spatial, key=lambda i: rhs_pos[spec[i]])
     return (spec.index(charpair[0]), spec.index(charpair[1])) + tuple(spatial)
 
   lhs_perm, rhs_perm, out_perm = map(getperm, dimension_numbers, charpairs)
@@ -895,24 +1062,59 @@ def _conv_general_proto(dimension_numbers):
 def _conv_general_vjp_lhs_padding(
     in_shape, window_dimensions, window_strides, out_shape, padding,
     lhs_dilation, rhs_dilation) -> List[Tuple[int, int]]:
-  lhs_dilated_shape = lax._dilate_shape(in_shape, lhs_dilation)
-  rhs_dilated_shape = lax._dilate_shape(window_dimensions, rhs_dilation)
-  out_dilated_shape = lax._dilate_shape(out_shape, window_strides)
-  pad_before = np.subtract(rhs_dilated_shape, [lo for lo, _ in padding]) - 1
-  pad_after = (np.add(lhs_dilated_shape, rhs_dilated_shape) - 1
-               - out_dilated_shape - pad_before)
+  args = (tuple(in_shape), tuple(window_dimensions), tuple(window_strides),
+          tuple(out_shape), tuple(map(tuple, padding)), tuple(lhs_dilation),
+          tuple(rhs_dilation))
+  # NOTE: Tracers in the shapes are unhashable, so they take the uncached path.
+  # Symbolic dimensions are hashable, but the key comparison may then have to
+  # compare one with an int, which can be inconclusive.
+  try:
+    return list(_conv_general_vjp_lhs_padding_cached(*args))
+  except (TypeError, core.InconclusiveDimensionOperation):
+    return _conv_general_vjp_lhs_padding_uncached(*args)
+
+@cache()
+def _conv_general_vjp_lhs_padding_cached(*args):
+  return tuple(_conv_general_vjp_lhs_padding_uncached(*args))
+
+def _conv_general_vjp_lhs_padding_uncached(
+    in_shape, window_dimensions, window_strides, out_shape, padding,
+    lhs_dilation, rhs_dilation) -> List[Tuple[int, int]]:
+  lhs_dilated_shape = _maybe_dilate_shape(in_shape, lhs_dilation)
+  rhs_dilated_shape = _maybe_dilate_shape(window_dimensions, rhs_dilation)
+  out_dilated_shape = _maybe_dilate_shape(out_shape, window_strides)
+  pad_before = tuple(r - lo - 1 for r, (lo, _)
+                     in safe_zip(rhs_dilated_shape, padding))
+  pad_after = tuple(l + r - 1 - o - b for l, r, o, b
+                    in safe_zip(lhs_dilated_shape, rhs_dilated_shape,
+                                out_dilated_shape, pad_before))
   return safe_zip(pad_before, pad_after)
 
 
 def _conv_general_vjp_rhs_padding(
     in_shape, window_dimensions, window_strides, out_shape, padding,
     lhs_dilation, rhs_dilation):
+  args = (tuple(in_shape), tuple(window_dimensions), tuple(window_strides),
+          tuple(out_shape), tuple(map(tuple, padding)), tuple(lhs_dilation),
+          tuple(rhs_dilation))
+  try:
+    return list(_conv_general_vjp_rhs_padding_cached(*args))
+  except (TypeError, core.InconclusiveDimensionOperation):
+    return _conv_general_vjp_rhs_padding_uncached(*args)
+
+@cache()
+def _conv_general_vjp_rhs_padding_cached(*args):
+  return tuple(_conv_general_vjp_rhs_padding_uncached(*args))
+
+def _conv_general_vjp_rhs_padding_uncached(
+    in_shape, window_dimensions, window_strides, out_shape, padding,
+    lhs_dilation, rhs_dilation):
 
   if len(in_shape) == 0:  # 0D conv
     return []
-  lhs_dilated_shape = lax._dilate_shape(in_shape, lhs_dilation)
-  rhs_dilated_shape = lax._dilate_shape(window_dimensions, rhs_dilation)
-  out_dilated_shape = lax._dilate_shape(out_shape, window_strides)
+  lhs_dilated_shape = _maybe_dilate_shape(in_shape, lhs_dilation)
+  rhs_dilated_shape = _maybe_dilate_shape(window_dimensions, rhs_dilation)
+  out_dilated_shape = _maybe_dilate_shape(out_shape, window_strides)
   pads_lo, _ = zip(*padding)
   pads_from_lhs = core.diff_shape(out_dilated_shape, lhs_dilated_shape)
   pads_from_rhs = core.diff_shape(core.diff_shape(rhs_dilated_shape, pads_lo),
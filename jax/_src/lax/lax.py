@@ -2316,6 +2316,11 @@ def _masked(padded_value, logical_shape, dimensions, value=0):
   Sets all padding to the given value (default is 0) in the given dimensions.
   All values outside the logical shape are considered padding.
   """
+  # Dimensions whose logical size is known to equal the padded size have no
+  # padding, so they don't need a mask.
+  dimensions = [d for d in dimensions
+                if not (isinstance(logical_shape[d], (int, np.integer)) and
+                        logical_shape[d] == padded_value.shape[d])]
   if len(dimensions) == 0:
     return padded_value
 
@@ -4399,6 +4404,20 @@ def canonicalize_precision(precision: PrecisionLike) -> Optional[Tuple[Precision
   The API can take the precision as a string, or int, and either as a single
   value to apply to both operands, or as a sequence of two values.
   """
+  # NOTE: Only strings and None need parsing (or a flag lookup); enum values
+  # are passed through as-is, so we don't cache them and thereby keep the
+  # exact enum objects that the caller passed in.
+  if precision is None or isinstance(precision, str):
+    return _canonicalize_precision_cached(precision)
+  return _canonicalize_precision(precision)
+
+@cache()
+def _canonicalize_precision_cached(
+    precision: Optional[str]) -> Optional[Tuple[PrecisionType, PrecisionType]]:
+  return _canonicalize_precision(precision)
+
+def _canonicalize_precision(
+    precision: PrecisionLike) -> Optional[Tuple[PrecisionType, PrecisionType]]:
   if precision is None:
     if config.jax_default_matmul_precision is None:
       return None
@@ -18,11 +18,12 @@ too many or too few limitations.
 
 """
 
-import collections
 import datetime
+import itertools
 import logging
 import os
-from typing import Any, Dict, Sequence, Tuple
+import re
+from typing import Any, Dict, Tuple
 import unittest
 
 from absl.testing import absltest
@@ -88,9 +89,7 @@ class JaxPrimitiveTest(jtu.JaxTestCase):
     harnesses = primitive_harness.all_harnesses
     print(f"Found {len(harnesses)} harnesses")
 
-    harness_groups: Dict[str, Sequence[primitive_harness.Harness]] = collections.defaultdict(list)
-
-    def unique_hash(h: primitive_harness.Harness, l: primitive_harness.Limitation):
+    def unique_key(h: primitive_harness.Harness, l: primitive_harness.Limitation):
       return (h.group_name, l.description, l.devices,
               tuple([np.dtype(d).name for d in l.dtypes]))
 
@@ -98,21 +97,22 @@ class JaxPrimitiveTest(jtu.JaxTestCase):
                                         primitive_harness.Limitation]] = {}
 
     for h in harnesses:
-      harness_groups[h.group_name].append(h)
       for l in h.jax_unimplemented:
         if l.enabled:
-          unique_limitations[hash(unique_hash(h, l))] = (h, l)
+          unique_limitations[unique_key(h, l)] = (h, l)
 
     primitive_coverage_table = ["""
 | Primitive | Total test harnesses | dtypes supported on at least one device | dtypes NOT tested on any device |
 | --- | --- | --- | --- |"""]
     all_dtypes = set(jtu.dtypes.all)
 
-    for group_name in sorted(harness_groups.keys()):
-      hlist = harness_groups[group_name]
-      dtypes_tested = set()  # Tested on at least some device
-      for h in hlist:
-        dtypes_tested = dtypes_tested.union({h.dtype})
+    group_key = lambda h: h.group_name
+    nr_primitives = 0
+    for group_name, group in itertools.groupby(
+        sorted(harnesses, key=group_key), key=group_key):
+      hlist = list(group)
+      nr_primitives += 1
+      dtypes_tested = {h.dtype for h in hlist}  # Tested on at least some device
 
       primitive_coverage_table.append(
         f"| {group_name} | {len(hlist)} | "
@@ -123,8 +123,8 @@ class JaxPrimitiveTest(jtu.JaxTestCase):
     primitive_unimpl_table = ["""
 | Affected primitive | Description of limitation | Affected dtypes | Affected devices |
 | --- | --- | --- | --- |"""]
-    for h, l in sorted(
-        unique_limitations.values(), key=lambda pair: unique_hash(*pair)):
+    for key in sorted(unique_limitations):
+      h, l = unique_limitations[key]
       devices = ", ".join(l.devices)
       primitive_unimpl_table.append(
         f"|{h.group_name}|{l.description}|"
@@ -142,12 +142,18 @@ class JaxPrimitiveTest(jtu.JaxTestCase):
     output_file = os.path.join(os.path.dirname(__file__),
                                '../g3doc/jax_primitives_coverage.md')
 
+    substitutions = {
+        "generation_date": str(datetime.date.today()),
+        "nr_harnesses": str(len(harnesses)),
+        "nr_primitives": str(nr_primitives),
+        "primitive_unimpl_table": "\n".join(primitive_unimpl_table),
+        "primitive_coverage_table": "\n".join(primitive_coverage_table),
+    }
     with open(output_file, "w") as f:
-      f.write(template.replace("{{generation_date}}", str(datetime.date.today())) \
-              .replace("{{nr_harnesses}}", str(len(harnesses))) \
-              .replace("{{nr_primitives}}", str(len(harness_groups))) \
-              .replace("{{primitive_unimpl_table}}", "\n".join(primitive_unimpl_table)) \
-              .replace("{{primitive_coverage_table}}", "\n".join(primitive_coverage_table)))
+      # Fill in all the {{key}} markers in a single pass over the template.
+      f.write(re.sub(r"{{(\w+)}}",
+                     lambda m: substitutions.get(m.group(1), m.group(0)),
+                     template))
 
 
 if __name__ == "__main__":
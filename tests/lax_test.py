@@ -37,6 +37,7 @@ from jax._src import dtypes
 from jax._src import test_util as jtu
 from jax._src import lax_reference
 from jax._src.util import prod
+from jax._src.lax import convolution as lax_convolution
 from jax._src.lax import lax as lax_internal
 
 
@@ -885,6 +886,74 @@ class LaxTest(jtu.JaxTestCase):
     grad = pullback(np.ones_like(res))
     self.assertAllClose((lhs * 10., rhs * 2.), grad)
 
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": f"_feature_group_count={feature_group_count}",
+       "feature_group_count": feature_group_count}
+      for feature_group_count in [1, 2]))
+  def testComplexConvHighestPrecision(self, feature_group_count):
+    # With Precision.HIGHEST the imaginary part must be accurate on its own,
+    # even when it is much smaller in magnitude than the real part.
+    rng = jtu.rand_default(self.rng())
+    lhs_shape = (2, 2 * feature_group_count, 9, 10)
+    rhs_shape = (3 * feature_group_count, 2, 4, 5)
+    lhs = (rng(lhs_shape, np.float32) +
+           1e-6j * rng(lhs_shape, np.float32)).astype(np.complex64)
+    rhs = (rng(rhs_shape, np.float32) +
+           1e-6j * rng(rhs_shape, np.float32)).astype(np.complex64)
+    out = lax.conv_general_dilated(lhs, rhs, (1, 1), 'VALID',
+                                   feature_group_count=feature_group_count,
+                                   precision=lax.Precision.HIGHEST)
+    expected = np.concatenate(
+        [lax_reference.conv(lhs_group.astype(np.complex128),
+                            rhs_group.astype(np.complex128), (1, 1), 'VALID')
+         for lhs_group, rhs_group in zip(
+             np.split(lhs, feature_group_count, axis=1),
+             np.split(rhs, feature_group_count, axis=0))], axis=1)
+    self.assertAllClose(expected.real, out.real, check_dtypes=False,
+                        atol=1e-4, rtol=1e-5)
+    self.assertAllClose(expected.imag, out.imag, check_dtypes=False,
+                        atol=1e-8, rtol=1e-5)
+
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": "_lhs_shape={}_rhs_shape={}".format(
+          jtu.format_shape_dtype_string(lhs_shape, np.float32),
+          jtu.format_shape_dtype_string(rhs_shape, np.float32)),
+       "lhs_shape": lhs_shape, "rhs_shape": rhs_shape}
+      for lhs_shape, rhs_shape in [
+          ((2, 0, 5, 5), (3, 0, 3, 3)),
+          ((0, 2, 5, 5), (3, 2, 3, 3)),
+          ((2, 2, 5, 5), (0, 2, 3, 3))]))
+  def testConvEmptyOperand(self, lhs_shape, rhs_shape):
+    lhs = np.ones(lhs_shape, np.float32)
+    rhs = np.ones(rhs_shape, np.float32)
+    fun = partial(lax.conv_general_dilated, window_strides=(1, 1),
+                  padding='SAME')
+    expected = np.zeros((lhs_shape[0], rhs_shape[0], 5, 5), np.float32)
+    self.assertAllClose(expected, fun(lhs, rhs))
+    self.assertAllClose(expected, jax.jit(fun)(lhs, rhs))
+
+  def testConvDimensionNumbersCaching(self):
+    lhs_shape, rhs_shape = (1, 4, 5, 2), (3, 3, 2, 6)
+    dn = lax.conv_dimension_numbers(lhs_shape, rhs_shape,
+                                    ('NHWC', 'HWIO', 'NHWC'))
+    self.assertEqual(dn, lax.ConvDimensionNumbers((0, 3, 1, 2), (3, 2, 0, 1),
+                                                  (0, 3, 1, 2)))
+    # The cache is keyed on the ranks, so other shapes of the same ranks hit it.
+    if not config.jax_check_tracer_leaks:
+      hits = lax_convolution._conv_dimension_numbers_cached.cache_info().hits
+      self.assertEqual(dn, lax.conv_dimension_numbers(
+          (2, 8, 8, 3), (1, 1, 3, 4), ('NHWC', 'HWIO', 'NHWC')))
+      self.assertEqual(
+          lax_convolution._conv_dimension_numbers_cached.cache_info().hits,
+          hits + 1)
+    # Lists are unhashable and take the uncached path.
+    self.assertEqual(dn, lax.conv_dimension_numbers(lhs_shape, rhs_shape,
+                                                    ['NHWC', 'HWIO', 'NHWC']))
+    # Errors still mention the operand shapes, even though the cache is keyed
+    # only on their ranks.
+    with self.assertRaisesRegex(TypeError, r"\(1, 4, 5, 2\) and \(3, 3, 2, 6\)"):
+      lax.conv_dimension_numbers(lhs_shape, rhs_shape, ('NHWC', 'HWIO', 'NHW'))
+
   @staticmethod
   def _conv_transpose_via_grad(data, kernel, strides, padding,
                                rhs_dilation=None, dimension_numbers=None):
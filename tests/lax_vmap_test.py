@@ -170,6 +170,50 @@ class LaxVmapTest(jtu.JaxTestCase):
     self._CheckBatching(conv, 5, (lhs_bdim, rhs_bdim), (lhs_shape, rhs_shape),
                         (dtype, dtype), rng, rtol=tol, atol=tol)
 
+  # The batch rule has dedicated paths for grouped convolutions depending on
+  # where the batch dimension sits, which the sampled test above may miss.
+  @parameterized.named_parameters(
+      {"testcase_name":
+       "_dims={}_feature_group_count={}_batch_group_count={}"
+       "_lhs_bdim={}_rhs_bdim={}".format(
+           ",".join(dim_nums), feature_group_count, batch_group_count,
+           lhs_bdim, rhs_bdim),
+       "dimension_numbers": dim_nums, "perms": perms,
+       "feature_group_count": feature_group_count,
+       "batch_group_count": batch_group_count,
+       "lhs_bdim": lhs_bdim, "rhs_bdim": rhs_bdim}
+      for dim_nums, perms, lhs_bdim, rhs_bdim in [
+          # Only rhs batched, with the batch dim just outside the rhs output
+          # feature dim.
+          (("NCHW", "OIHW", "NCHW"), ([0, 1, 2, 3], [0, 1, 2, 3]), None, 0),
+          (("NHWC", "HWIO", "NHWC"), ([0, 2, 3, 1], [2, 3, 1, 0]), None, 3),
+          # Only rhs batched, with the batch dim elsewhere.
+          (("NCHW", "OIHW", "NCHW"), ([0, 1, 2, 3], [0, 1, 2, 3]), None, 2),
+          (("NHWC", "HWIO", "NHWC"), ([0, 2, 3, 1], [2, 3, 1, 0]), None, 0),
+          (("NHWC", "OIHW", "NCHW"), ([0, 2, 3, 1], [0, 1, 2, 3]), None, 4),
+          # Only lhs batched.
+          (("NCHW", "OIHW", "NCHW"), ([0, 1, 2, 3], [0, 1, 2, 3]), 0, None),
+          (("NHWC", "HWIO", "NHWC"), ([0, 2, 3, 1], [2, 3, 1, 0]), 2, None),
+      ]
+      for feature_group_count, batch_group_count in [(2, 1), (1, 2)])
+  def testConvGeneralDilatedGroupedBatching(
+      self, dimension_numbers, perms, feature_group_count, batch_group_count,
+      lhs_bdim, rhs_bdim):
+    rng = jtu.rand_default(self.rng())
+    dtype = np.float32
+    lhs_perm, rhs_perm = perms
+    lhs_shape = list(np.take((2 * batch_group_count, 3 * feature_group_count,
+                              6, 7), lhs_perm))
+    rhs_shape = list(np.take((4 * batch_group_count * feature_group_count, 3,
+                              2, 2), rhs_perm))
+    conv = partial(lax.conv_general_dilated, window_strides=(1, 1),
+                   padding="VALID", dimension_numbers=dimension_numbers,
+                   feature_group_count=feature_group_count,
+                   batch_group_count=batch_group_count,
+                   precision=lax.Precision.HIGHEST)
+    self._CheckBatching(conv, 3, (lhs_bdim, rhs_bdim), (lhs_shape, rhs_shape),
+                        (dtype, dtype), rng, rtol=1e-3, atol=1e-3)
+
   @parameterized.named_parameters(jtu.cases_from_list(
       {"testcase_name": "_shape={}_from_dtype={}_to_dtype={}_bdims={}".format(
           shape, from_dtype, to_dtype, bdims),